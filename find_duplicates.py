@@ -5,30 +5,119 @@ Duplicates are identified as multiple projects targeting the same repository.
 """
 
 import argparse
-import json
+import hashlib
 import os
 import sys
-from collections import defaultdict
-from typing import Dict, List, Any
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Any, BinaryIO, NamedTuple, Optional
+from urllib.parse import urljoin
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared read-only fallback for missing nested objects; avoids allocating a new {} per lookup
+_EMPTY: Dict[str, Any] = {}
+
+
+def _intern(value: Any) -> Any:
+    """
+    Intern string values; anything else (e.g. an explicit null) is returned unchanged.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ProjectInfo(NamedTuple):
+    """
+    Fields of a project needed for duplicate detection and reporting.
+    """
+    project_id: str
+    project_name: str
+    target_id: str
+    target_name: Optional[str]
+    project_type: Optional[str]
+    origin: Optional[str]
 
 
 class SnykDuplicateFinder:
-    def __init__(self, org_id: str, api_token: str):
+    def __init__(self, org_id: str, api_token: str, cache_ttl: int = 0, max_retries: int = 5):
         self.org_id = org_id
         self.api_token = api_token
+        self.cache_ttl = cache_ttl
+        self.cache_dir = os.path.join(os.path.expanduser("~/.cache"), "snyk_find_duplicates", org_id)
         self.base_url = "https://api.eu.snyk.io/rest"
         self.api_version = "2025-11-05"
+        self.timeout = 30  # Seconds to wait for a connection or response per request
         self.headers = {
             "Authorization": f"token {api_token}",
             "Content-Type": "application/vnd.api+json"
         }
 
-    def fetch_all_projects(self) -> tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        # Reuse one connection across pages and retry rate limits / transient errors
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=retry))
+
+    def _get_page(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Fetch a single page and return the decoded JSON body.
+        When cache_ttl is set, bodies are cached on disk and reused while fresh.
+        The cache is best-effort: unreadable or corrupt entries count as a miss
+        and failures to write an entry are ignored.
+        """
+        cache_path = None
+        if self.cache_ttl > 0:
+            key = hashlib.sha256(url.encode() + orjson.dumps(params or {}, option=orjson.OPT_SORT_KEYS)).hexdigest()
+            cache_path = os.path.join(self.cache_dir, f"{key}.json")
+            try:
+                if time.time() - os.path.getmtime(cache_path) < self.cache_ttl:
+                    with open(cache_path, "rb") as f:
+                        return orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                pass
+
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        # Decode straight from the body bytes; avoids building an intermediate str
+        data = orjson.loads(response.content)
+
+        if cache_path:
+            # Write to a temp file and rename so readers never see a partial entry
+            tmp_path = None
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(response.content)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                if tmp_path:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+        return data
+
+    def fetch_all_projects(self) -> tuple[List[ProjectInfo], Dict[str, Optional[str]]]:
         """
         Fetch all projects from the Snyk organization with pagination.
-        Returns projects data and included targets data.
+        Returns the extracted project records and a mapping of target ID to target display name
+        (None when the API reports a null display_name).
+
+        The REST API paginates with opaque cursors (links.next carries a
+        starting_after token), so page N+1 cannot be requested before page N
+        has been received and pages are fetched sequentially.
         """
         url = f"{self.base_url}/orgs/{self.org_id}/projects"
         params = {
@@ -38,117 +127,125 @@ class SnykDuplicateFinder:
         }
 
         all_projects = []
-        all_targets = {}
+        target_names: Dict[str, Optional[str]] = {}
 
         while url:
             try:
-                response = requests.get(url, headers=self.headers, params=params)
-                response.raise_for_status()
-
-                data = response.json()
+                data = self._get_page(url, params)
 
                 # Check for errors in response
                 if "errors" in data:
-                    print(f"API Error: {json.dumps(data['errors'], indent=2)}", file=sys.stderr)
+                    print(f"API Error: {orjson.dumps(data['errors'], option=orjson.OPT_INDENT_2).decode()}", file=sys.stderr)
                     break
 
-                # Extract projects from response
+                # Extract included targets (these contain the display_name); only the name is kept
+                included = data.get("included")
+                if included:
+                    target_names.update(
+                        (item.get("id"), (item.get("attributes") or _EMPTY).get("display_name", ""))
+                        for item in included if item.get("type") == "target"
+                    )
+
+                # Extract projects from response, keeping only the fields we need so the
+                # raw page (relationships, meta, links) can be released after this iteration
                 if "data" in data:
-                    all_projects.extend(data["data"])
+                    all_projects.extend(self.extract_project_info(project, target_names) for project in data["data"])
                     print(f"Fetched {len(data['data'])} projects... (Total: {len(all_projects)})", file=sys.stderr)
 
-                # Extract included targets (these contain the display_name)
-                if "included" in data:
-                    for item in data["included"]:
-                        if item.get("type") == "target":
-                            target_id = item.get("id")
-                            all_targets[target_id] = item
-
                 # Check for next page
-                next_url = data.get("links", {}).get("next")
+                next_url = (data.get("links") or _EMPTY).get("next")
                 if next_url:
-                    # Handle relative URLs by prepending the base domain
-                    if next_url.startswith("/"):
-                        url = f"https://api.eu.snyk.io{next_url}"
-                    else:
-                        url = next_url
+                    # Resolve relative links (path or query only) against the current page URL
+                    url = urljoin(url, next_url)
                     # Clear params for next request as URL already includes them
                     params = None
                 else:
                     url = None
 
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+                # A non-JSON body (e.g. an HTML page from a proxy) is treated like a failed request
                 print(f"Error fetching projects: {e}", file=sys.stderr)
                 sys.exit(1)
 
-        return all_projects, all_targets
+        # Targets normally arrive on the same page as their projects; fill in any
+        # record whose target was only included on a later page
+        all_projects = [
+            project._replace(target_name=target_names[project.target_id])
+            if not project.target_name and target_names.get(project.target_id) else project
+            for project in all_projects
+        ]
+
+        return all_projects, target_names
 
-    def extract_project_info(self, project: Dict[str, Any], targets: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    def extract_project_info(self, project: Dict[str, Any], target_names: Dict[str, Optional[str]]) -> ProjectInfo:
         """
         Extract relevant information from a project object.
         """
-        project_id = project.get("id", "")
-        attributes = project.get("attributes", {})
-        relationships = project.get("relationships", {})
+        attributes = project.get("attributes") or _EMPTY
+        relationships = project.get("relationships") or _EMPTY
+        target_id = ((relationships.get("target") or _EMPTY).get("data") or _EMPTY).get("id", "")
+
+        return ProjectInfo(
+            project.get("id", ""),
+            attributes.get("name", "Unknown"),
+            target_id,
+            # Get target display name from the included targets data
+            target_names.get(target_id, ""),
+            # Low-cardinality fields share one string object across records
+            _intern(attributes.get("type", "")),
+            _intern(attributes.get("origin", ""))
+        )
+
+    def find_duplicates(self, projects: List[ProjectInfo]) -> Dict[str, Dict[str, List[ProjectInfo]]]:
+        """
+        Group projects by target, then find duplicate project names within each target.
+        Returns a nested dict: {target_name: {project_name: [projects]}}
+        """
+        # First pass: compute the (target, project name) key of every project
+        keys = [(p.target_name or p.target_id or "unknown", p.project_name) for p in projects]
 
-        # Extract project name
-        project_name = attributes.get("name", "Unknown")
+        counts = Counter(keys)
 
-        # Extract target information
-        target_data = relationships.get("target", {}).get("data", {})
-        target_id = target_data.get("id", "")
+        # Second pass: only group projects whose key occurs more than once
+        duplicates = {}
 
-        # Get target display name from the included targets data
-        target_name = ""
-        if target_id and target_id in targets:
-            target_attributes = targets[target_id].get("attributes", {})
-            target_name = target_attributes.get("display_name", "")
+        for key, info in zip(keys, projects):
+            if counts[key] > 1:
+                duplicates.setdefault(key[0], {}).setdefault(key[1], []).append(info)
 
-        return {
-            "project_id": project_id,
-            "project_name": project_name,
-            "target_id": target_id,
-            "target_name": target_name,
-            "project_type": attributes.get("type", ""),
-            "origin": attributes.get("origin", "")
-        }
+        # List targets in the order they first appeared, not the order of their first duplicate
+        return {target: duplicates[target] for target in dict.fromkeys(key[0] for key in keys) if target in duplicates}
 
-    def find_duplicates(self, projects: List[Dict[str, Any]], targets: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    def _empty_report(self) -> Dict[str, Any]:
         """
-        Group projects by target, then find duplicate project names within each target.
-        Returns a nested dict: {target_name: {project_name: [projects]}}
+        Report returned when no duplicate projects were found.
         """
-        # First group by target
-        by_target = defaultdict(list)
+        return {"org_id": self.org_id, "duplicates_by_target": []}
 
-        for project in projects:
-            info = self.extract_project_info(project, targets)
-            target_key = info["target_name"] or info["target_id"] or "unknown"
-            by_target[target_key].append(info)
+    def _target_group(self, target_name: str, duplicate_projects: Dict[str, List[ProjectInfo]]) -> tuple[Dict[str, Any], int]:
+        """
+        Build the report entry for one target.
+        Returns the entry and the number of duplicate projects it contains.
+        """
+        target_group = {
+            "target_name": target_name,
+            "duplicate_project_names": []
+        }
 
-        # Now find duplicates within each target (same project name)
-        duplicates = {}
+        total_duplicate_projects = 0
 
-        for target_name, target_projects in by_target.items():
-            # Group projects by name within this target
-            by_project_name = defaultdict(list)
-            for proj in target_projects:
-                by_project_name[proj["project_name"]].append(proj)
-
-            # Filter to only include project names with duplicates
-            duplicate_projects = {
-                proj_name: proj_list
-                for proj_name, proj_list in by_project_name.items()
-                if len(proj_list) > 1
+        for project_name, projects in duplicate_projects.items():
+            total_duplicate_projects += len(projects)
+            duplicate_entry = {
+                "project_name": project_name,
+                "duplicate_count": len(projects),
+                "projects": [project._asdict() for project in projects]
             }
+            target_group["duplicate_project_names"].append(duplicate_entry)
 
-            # Only include targets that have duplicate projects
-            if duplicate_projects:
-                duplicates[target_name] = duplicate_projects
+        return target_group, total_duplicate_projects
 
-        return duplicates
-
-    def generate_report(self, duplicates: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    def generate_report(self, duplicates: Dict[str, Dict[str, List[ProjectInfo]]]) -> Dict[str, Any]:
         """
         Generate a report of duplicate projects grouped by target.
         """
@@ -161,48 +258,86 @@ class SnykDuplicateFinder:
         total_duplicate_projects = 0
 
         for target_name, duplicate_projects in duplicates.items():
-            target_group = {
-                "target_name": target_name,
-                "duplicate_project_names": []
-            }
-
-            for project_name, projects in duplicate_projects.items():
-                total_duplicate_projects += len(projects)
-                duplicate_entry = {
-                    "project_name": project_name,
-                    "duplicate_count": len(projects),
-                    "projects": projects
-                }
-                target_group["duplicate_project_names"].append(duplicate_entry)
-
+            target_group, count = self._target_group(target_name, duplicate_projects)
+            total_duplicate_projects += count
             report["duplicates_by_target"].append(target_group)
 
         report["total_duplicate_projects"] = total_duplicate_projects
 
         return report
 
-    def run(self) -> Dict[str, Any]:
+    def write_report(self, fp: BinaryIO, duplicates: Dict[str, Dict[str, List[ProjectInfo]]]) -> None:
         """
-        Main execution method.
+        Write the report of duplicate projects grouped by target to a binary file.
+        Produces the same JSON as generate_report, but target groups are serialized
+        and written one at a time instead of building the whole report in memory first.
+        """
+        if not duplicates:
+            fp.write(orjson.dumps(self._empty_report(), option=orjson.OPT_INDENT_2))
+            fp.write(b"\n")
+            return
+
+        fp.write(b'{\n  "org_id": ' + orjson.dumps(self.org_id))
+        fp.write(b',\n  "total_targets_with_duplicates": ' + str(len(duplicates)).encode())
+        fp.write(b',\n  "duplicates_by_target": [')
+
+        total_duplicate_projects = 0
+        separator = b"\n    "
+
+        for target_name, duplicate_projects in duplicates.items():
+            target_group, count = self._target_group(target_name, duplicate_projects)
+            total_duplicate_projects += count
+
+            # Indent the group to its position inside the duplicates_by_target array
+            group_json = orjson.dumps(target_group, option=orjson.OPT_INDENT_2)
+            fp.write(separator + group_json.replace(b"\n", b"\n    "))
+            separator = b",\n    "
+
+        fp.write(b'\n  ],\n  "total_duplicate_projects": ' + str(total_duplicate_projects).encode() + b"\n}\n")
+
+    def analyze(self) -> Dict[str, Dict[str, List[ProjectInfo]]]:
+        """
+        Fetch all projects and find duplicates.
+        Returns the duplicate projects grouped by target name and project name.
         """
         print(f"Fetching projects for organization: {self.org_id}", file=sys.stderr)
-        projects, targets = self.fetch_all_projects()
+        projects, target_names = self.fetch_all_projects()
         print(f"Total projects fetched: {len(projects)}", file=sys.stderr)
-        print(f"Total unique targets: {len(targets)}", file=sys.stderr)
+        print(f"Total unique targets: {len(target_names)}", file=sys.stderr)
 
         print("Analyzing for duplicates...", file=sys.stderr)
-        duplicates = self.find_duplicates(projects, targets)
+        duplicates = self.find_duplicates(projects)
 
         if not duplicates:
             print("No duplicate projects found!", file=sys.stderr)
-            return {"org_id": self.org_id, "duplicates_by_target": []}
+        else:
+            print(f"Found {len(duplicates)} targets with duplicate projects", file=sys.stderr)
+
+        return duplicates
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Main execution method.
+        """
+        duplicates = self.analyze()
 
-        print(f"Found {len(duplicates)} targets with duplicate projects", file=sys.stderr)
+        if not duplicates:
+            return self._empty_report()
 
         report = self.generate_report(duplicates)
         return report
 
 
+def non_negative_int(value: str) -> int:
+    """
+    argparse type for options that take a count of zero or more.
+    """
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, got {value}")
+    return number
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Find duplicate Snyk projects in an organization"
@@ -221,6 +356,18 @@ def main():
         help="Output file path (default: stdout)",
         default=None
     )
+    parser.add_argument(
+        "--cache-ttl",
+        help="Reuse API responses cached on disk for this many seconds (default: 0, disabled)",
+        type=int,
+        default=0
+    )
+    parser.add_argument(
+        "--max-retries",
+        help="Maximum retries per request on rate limiting (HTTP 429) or server errors (default: 5)",
+        type=non_negative_int,
+        default=5
+    )
 
     args = parser.parse_args()
 
@@ -229,18 +376,19 @@ def main():
               file=sys.stderr)
         sys.exit(1)
 
-    finder = SnykDuplicateFinder(args.org_id, args.api_token)
-    report = finder.run()
+    finder = SnykDuplicateFinder(args.org_id, args.api_token, cache_ttl=args.cache_ttl,
+                                 max_retries=args.max_retries)
+    duplicates = finder.analyze()
 
     # Output results
-    output_json = json.dumps(report, indent=2)
-
     if args.output:
-        with open(args.output, 'w') as f:
-            f.write(output_json)
+        with open(args.output, 'wb') as f:
+            finder.write_report(f, duplicates)
         print(f"Report written to: {args.output}", file=sys.stderr)
     else:
-        print(output_json)
+        sys.stdout.flush()
+        finder.write_report(sys.stdout.buffer, duplicates)
+        sys.stdout.buffer.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+import io
+import unittest
+
+import orjson
+
+from find_duplicates import ProjectInfo, SnykDuplicateFinder
+
+
+def make_project(project_id, project_name, target_id, target_name, project_type="npm", origin="github"):
+    return ProjectInfo(project_id, project_name, target_id, target_name, project_type, origin)
+
+
+class WriteReportTest(unittest.TestCase):
+    """
+    write_report builds its JSON framing by hand; it must stay in sync with generate_report.
+    """
+
+    def setUp(self):
+        self.finder = SnykDuplicateFinder("org-123", "token")
+
+    def write(self, duplicates):
+        fp = io.BytesIO()
+        self.finder.write_report(fp, duplicates)
+        return fp.getvalue()
+
+    def test_matches_generate_report(self):
+        duplicates = {
+            "my-org/repo-a": {
+                "package.json": [
+                    make_project("p1", "package.json", "t1", "my-org/repo-a"),
+                    make_project("p2", "package.json", "t1", "my-org/repo-a"),
+                ],
+                "Dockerfile": [
+                    make_project("p3", "Dockerfile", "t1", "my-org/repo-a", "deb", None),
+                    make_project("p4", "Dockerfile", "t1", "my-org/repo-a", "deb", None),
+                    make_project("p5", "Dockerfile", "t1", "my-org/repo-a", "deb", None),
+                ],
+            },
+            "t2": {
+                "pom.xml é\n": [
+                    make_project("p6", "pom.xml é\n", "t2", None, "maven", "cli"),
+                    make_project("p7", "pom.xml é\n", "t2", None, "maven", "cli"),
+                ],
+            },
+        }
+
+        output = self.write(duplicates)
+        report = self.finder.generate_report(duplicates)
+
+        self.assertEqual(orjson.loads(output), report)
+        self.assertEqual(output, orjson.dumps(report, option=orjson.OPT_INDENT_2) + b"\n")
+
+    def test_single_target(self):
+        duplicates = {
+            "repo": {"app": [make_project("p1", "app", "t1", "repo"), make_project("p2", "app", "t1", "repo")]},
+        }
+
+        self.assertEqual(orjson.loads(self.write(duplicates)), self.finder.generate_report(duplicates))
+
+    def test_no_duplicates(self):
+        self.assertEqual(orjson.loads(self.write({})), {"org_id": "org-123", "duplicates_by_target": []})
+
+
+if __name__ == "__main__":
+    unittest.main()